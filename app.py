@@ -1,23 +1,37 @@
-import json
 import os
 import logging
-import base64
+import functools
+import hashlib
 import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import orjson
+from cachetools import LRUCache, TTLCache
 from flask import Flask, request, jsonify
-import google.generativeai as genai
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from flask.json.provider import JSONProvider
 import requests
-from PIL import Image
-from sheets_integration import SheetsManager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sheets_integration import SheetsManager, MONTHLY_TOTAL_COLUMNS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(JSONProvider):
+    """Serve jsonify() responses and parse request bodies with orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Environment variables - with safe defaults
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
@@ -25,66 +39,217 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 GOOGLE_SHEETS_ID = os.environ.get('GOOGLE_SHEETS_ID')
 GOOGLE_CREDENTIALS_JSON = os.environ.get('GOOGLE_CREDENTIALS_JSON')
 
-# Configure Gemini only if API key is available
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+# Log every raw webhook body - for debugging only, it is serialized on each update
+DEBUG_DUMP_EVENT = os.environ.get('DEBUG_DUMP_EVENT', 'False').lower() == 'true'
+
+# Background threads processing messages; the Telegram pool keeps one connection per thread
+PROCESSING_WORKERS = 32
+
+# Pooled keep-alive session for Telegram API calls
+TELEGRAM_API_TIMEOUT = (2, 5)  # (connect, read) seconds
+TELEGRAM_FILE_TIMEOUT = (2, 30)
+JSON_HEADERS = {'Content-Type': 'application/json'}
+_TG_SESSION = requests.Session()
+_TG_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=PROCESSING_WORKERS,
+    max_retries=Retry(total=2, backoff_factor=0.2)
+))
+
+# Gemini model and the extraction prompt sent with every request
+GEMINI_MODEL_NAME = 'gemini-2.5-flash-preview-05-20'
+
+# How long a /summary result is reused before Sheets is read again
+SUMMARY_CACHE_TTL = 30  # seconds
+
+# How long a processed Telegram update id is remembered to drop redelivered updates
+UPDATE_DEDUP_TTL = 600  # seconds
+
+# Number of Gemini extraction results kept for re-sent receipts and texts
+EXTRACTION_CACHE_SIZE = 1024
+
+# Magic bytes of the image formats Gemini accepts without conversion
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png')
+)
+
+# Largest Telegram file downloaded for analysis
+MAX_FILE_SIZE = 5 * 1024 * 1024
+FILE_TOO_LARGE_MSG = "❌ File too large (max 5 MB)"
+
+# Enough of the file for Pillow to read image dimensions and mode
+IMAGE_HEADER_BYTES = 64 * 1024
+
+# Longest edge sent to Gemini, and the quality used when an image has to be re-encoded
+MAX_IMAGE_DIMENSION = 1600
+JPEG_QUALITY = 75
+
+EXTRACTION_PROMPT = """
+Analyze this receipt/expense and extract the following information in JSON format:
+{
+  "amount": float (just the number),
+  "category": "one of: food, transport, utilities, shopping, entertainment, healthcare, other",
+  "description": "brief description of the expense",
+  "date": "YYYY-MM-DD format, use today if not clear",
+  "merchant": "store/company name if available"
+}
+
+If this is not a valid expense or receipt, return: {"error": "Not a valid expense"}
+"""
+
+# Reply templates, filled with str.format_map
+SUMMARY_TMPL = """📊 <b>Monthly Summary ({month})</b>
+
+💰 <b>Total:</b> ${total:.2f}
+
+<b>By Category:</b>
+🍔 Food: ${food:.2f}
+🚗 Transport: ${transport:.2f}
+⚡ Utilities: ${utilities:.2f}
+🛍️ Shopping: ${shopping:.2f}
+🎬 Entertainment: ${entertainment:.2f}
+🏥 Healthcare: ${healthcare:.2f}
+📋 Other: ${other:.2f}"""
+
+LOGGED_TMPL = """✅ <b>Expense Logged!</b>
+
+💰 Amount: ${amount}
+📂 Category: {category}
+📝 Description: {description}
+📅 Date: {date}
+🏪 Merchant: {merchant}"""
+
+# A month with nothing logged yet comes back with only its total
+_SUMMARY_DEFAULTS = dict.fromkeys(MONTHLY_TOTAL_COLUMNS, 0)
+# Fields the extraction left out
+_LOGGED_DEFAULTS = dict.fromkeys(('amount', 'category', 'description', 'date', 'merchant'), 'N/A')
+
+# Short text expenses like "Coffee $5.50" are parsed locally when a keyword pins the category
+FAST_PATH_MAX_WORDS = 3
+FAST_PATH_CATEGORIES = {
+    'breakfast': 'food', 'lunch': 'food', 'dinner': 'food', 'coffee': 'food',
+    'snack': 'food', 'snacks': 'food', 'groceries': 'food',
+    'uber': 'transport', 'grab': 'transport', 'taxi': 'transport', 'bus': 'transport',
+    'train': 'transport', 'parking': 'transport', 'petrol': 'transport', 'fuel': 'transport',
+    'electricity': 'utilities', 'internet': 'utilities',
+    'clothes': 'shopping', 'shoes': 'shopping',
+    'movie': 'entertainment', 'movies': 'entertainment', 'cinema': 'entertainment',
+    'netflix': 'entertainment', 'spotify': 'entertainment',
+    'pharmacy': 'healthcare', 'medicine': 'healthcare', 'doctor': 'healthcare', 'dentist': 'healthcare'
+}
+# An amount can't follow a digit, "." or "-" - ".50" and "-5" are left to Gemini
+_AMOUNT_RE = re.compile(r'(?<![\d.\-$])\$?\s*(\d+(?:\.\d{1,2})?)\b')
+_WORD_RE = re.compile(r'[a-z]+')
+# Anything besides words, whitespace and "$" left around the amount
+_FAST_PATH_EXTRA_RE = re.compile(r'[^a-zA-Z\s$]')
+_DIGIT_RE = re.compile(r'\d')
+
+# The JSON object in a model reply, with or without a markdown fence or chatter around it
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+_GENAI_LOCK = threading.Lock()
+_genai_configured = False
+
+def _get_genai():
+    """Import the Gemini SDK, configuring it exactly once per process"""
+    global _genai_configured
+    
+    # Imported here so cold starts that never reach Gemini (health checks, commands) skip it
+    import google.generativeai as genai
+    
+    with _GENAI_LOCK:
+        if not _genai_configured:
+            genai.configure(api_key=GEMINI_API_KEY)
+            _genai_configured = True
+    return genai
+
+@functools.lru_cache(maxsize=1)
+def _get_model():
+    """Build the Gemini model once so every tracker and thread shares its client"""
+    return _get_genai().GenerativeModel(GEMINI_MODEL_NAME)
 
 class ExpenseTracker:
     def __init__(self):
         # Only initialize if required env vars are present
         if not GEMINI_API_KEY:
             logger.warning("GEMINI_API_KEY not found - AI features disabled")
-            self.model = None
-        else:
-            self.model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
         
         # Sheets manager will be initialized lazily
         self._sheets_manager = None
+        self._sheets_lock = threading.Lock()
+        
+        # Monthly summaries by month, dropped whenever an expense is logged
+        self._summary_cache = TTLCache(maxsize=128, ttl=SUMMARY_CACHE_TTL)
+        self._summary_lock = threading.Lock()
+        
+        # Gemini results keyed by a hash of the input content
+        self._extraction_cache = LRUCache(maxsize=EXTRACTION_CACHE_SIZE)
+        self._extraction_lock = threading.Lock()
+        
+    @property
+    def model(self):
+        """Shared Gemini model, None when AI features are disabled"""
+        return _get_model() if GEMINI_API_KEY else None
         
     @property
     def sheets_manager(self):
         """Lazy initialization of SheetsManager"""
         if self._sheets_manager is None and GOOGLE_CREDENTIALS_JSON and GOOGLE_SHEETS_ID:
-            try:
-                self._sheets_manager = SheetsManager(
-                    credentials_json=GOOGLE_CREDENTIALS_JSON,
-                    spreadsheet_id=GOOGLE_SHEETS_ID
-                )
-            except Exception as e:
-                logger.error(f"Failed to initialize SheetsManager: {e}")
+            # The tracker is shared across request threads - build the manager only once
+            with self._sheets_lock:
+                if self._sheets_manager is None:
+                    try:
+                        self._sheets_manager = SheetsManager(
+                            credentials_json=GOOGLE_CREDENTIALS_JSON,
+                            spreadsheet_id=GOOGLE_SHEETS_ID
+                        )
+                    except Exception as e:
+                        logger.error("Failed to initialize SheetsManager: %s", e)
         return self._sheets_manager
 
-    def extract_expense_data(self, text_content=None, image_data=None):
-        """Extract expense information using Gemini 2.5 Flash"""
+    def warm_up(self):
+        """Import and configure the Gemini SDK ahead of an extraction"""
+        return self.model
+
+    def warm_up_sheets(self):
+        """Build the Sheets client ahead of the first log"""
+        return self.sheets_manager
+
+    def _extraction_cache_key(self, text_content, image_data):
+        """Hash the content sent to Gemini, scoped to today since undated expenses default to today"""
+        digest = hashlib.sha256(datetime.now().strftime('%Y-%m-%d').encode())
+        if image_data:
+            digest.update(b'image:')
+            digest.update(image_data)
+        else:
+            # "Coffee  $5" and "coffee $5" extract to the same expense
+            digest.update(b'text:')
+            digest.update(' '.join((text_content or '').lower().split()).encode())
+        return digest.digest()
+
+    def extract_expense_data(self, text_content=None, image_data=None, mime_type='image/jpeg', use_cache=True):
+        """Extract expense information using Gemini 2.5 Flash (use_cache=False forces a fresh call)"""
         if not self.model:
             return {"error": "AI service not available"}
         
-        prompt = """
-        Analyze this receipt/expense and extract the following information in JSON format:
-        {
-          "amount": float (just the number),
-          "category": "one of: food, transport, utilities, shopping, entertainment, healthcare, other",
-          "description": "brief description of the expense",
-          "date": "YYYY-MM-DD format, use today if not clear",
-          "merchant": "store/company name if available"
-        }
-        
-        If this is not a valid expense or receipt, return: {"error": "Not a valid expense"}
-        """
+        # Re-sent receipts and repeated texts are answered from the cache
+        cache_key = self._extraction_cache_key(text_content, image_data)
+        with self._extraction_lock:
+            cached = self._extraction_cache.get(cache_key) if use_cache else None
+        if cached:
+            return dict(cached)
         
         try:
             if image_data:
                 # Create image part for Gemini API - Fix: Don't log the image_data
-                image_part = {
-                    "mime_type": "image/jpeg",
-                    "data": base64.b64encode(image_data).decode()
-                }
-                
-                # Process image with text
-                response = self.model.generate_content([prompt, image_part])
+                # The SDK takes the raw bytes as downloaded or re-encoded, so there is no base64 round-trip
+                image_part = _get_genai().protos.Blob(mime_type=mime_type, data=image_data)
+                parts = [image_part]
             else:
-                # Process text only
-                response = self.model.generate_content(f"{prompt}\n\nText: {text_content}")
+                parts = ["Text:", text_content]
+            
+            response = self.model.generate_content([EXTRACTION_PROMPT, *parts])
             
             # Fix: Check if response exists and has text
             if not response or not hasattr(response, 'text') or not response.text:
@@ -92,19 +257,23 @@ class ExpenseTracker:
                 return {"error": "No response from AI"}
             
             # Extract JSON from response
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
+            match = _JSON_RE.search(response.text)
+            if not match:
+                logger.error("No JSON object in Gemini response")
+                return {"error": "Failed to parse AI response"}
             
-            return json.loads(response_text)
+            expense_data = orjson.loads(match.group())
+            if 'error' not in expense_data:
+                with self._extraction_lock:
+                    self._extraction_cache[cache_key] = dict(expense_data)
             
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}")
+            return expense_data
+            
+        except orjson.JSONDecodeError as e:
+            logger.error("JSON parsing error: %s", e)
             return {"error": "Failed to parse AI response"}
         except Exception as e:
-            logger.error(f"Error processing with Gemini: {e}")
+            logger.error("Error processing with Gemini: %s", e)
             return {"error": f"Processing failed: {str(e)}"}
 
     def log_to_sheets(self, expense_data):
@@ -114,19 +283,161 @@ class ExpenseTracker:
             return False
         
         try:
-            return self.sheets_manager.log_expense(expense_data)
+            success = self.sheets_manager.log_expense(expense_data)
+            if success:
+                with self._summary_lock:
+                    self._summary_cache.clear()
+            return success
         except Exception as e:
-            logger.error(f"Error logging to sheets: {e}")
+            logger.error("Error logging to sheets: %s", e)
             return False
     
     def get_monthly_summary(self, month_str=None):
         """Get monthly expense summary"""
+        month_str = month_str or datetime.now().strftime('%Y-%m')
+        
+        # All chats log to the same spreadsheet, so the month alone identifies a summary
+        with self._summary_lock:
+            summary = self._summary_cache.get(month_str)
+        if summary:
+            return summary
+        
         try:
-            return self.sheets_manager.get_monthly_total(month_str)
+            summary = self.sheets_manager.get_monthly_total(month_str)
+            # Failed reads aren't cached, so the next /summary tries Sheets again
+            if summary:
+                with self._summary_lock:
+                    self._summary_cache[month_str] = summary
+            return summary
         except Exception as e:
-            logger.error(f"Error getting monthly summary: {e}")
+            logger.error("Error getting monthly summary: %s", e)
             return None
 
+def fast_parse_text(text):
+    """Parse a short "<keyword> $<amount>" expense without Gemini, or return None if ambiguous"""
+    amounts = _AMOUNT_RE.findall(text)
+    words = _WORD_RE.findall(text.lower())
+    if len(amounts) != 1 or not words or len(words) > FAST_PATH_MAX_WORDS:
+        return None
+    
+    # Any other word ("yesterday", a merchant name) may carry detail only Gemini reads
+    if any(word not in FAST_PATH_CATEGORIES for word in words):
+        return None
+    
+    categories = {FAST_PATH_CATEGORIES[word] for word in words}
+    if len(categories) != 1:
+        return None
+    
+    # Leftover digits or punctuation ("$.50", "5.555", "2x") mean the amount may be misread
+    rest = _AMOUNT_RE.sub('', text)
+    if _FAST_PATH_EXTRA_RE.search(rest):
+        return None
+    
+    amount = float(amounts[0])
+    if amount <= 0:
+        return None
+    
+    description = ' '.join(rest.replace('$', ' ').split())
+    return {
+        "amount": amount,
+        "category": categories.pop(),
+        "description": description[:1].upper() + description[1:],
+        "date": datetime.now().strftime('%Y-%m-%d'),
+        "merchant": ""
+    }
+
+def _fits_gemini(photo_size):
+    """Check whether a Telegram PhotoSize is within MAX_IMAGE_DIMENSION"""
+    return max(photo_size.get('width', 0), photo_size.get('height', 0)) <= MAX_IMAGE_DIMENSION
+
+def pick_photo_size(photo_sizes):
+    """Pick the largest Telegram photo size"""
+    # Telegram's sizes below the largest (1280 px and down) are under the resolution dense receipts
+    # need - a larger photo is downscaled to MAX_IMAGE_DIMENSION by prepare_image instead
+    return max(photo_sizes, key=lambda size: size.get('width', 0) * size.get('height', 0))
+
+def sniff_image_mime(data):
+    """Return the mime type of a JPEG, PNG or WebP image from its magic bytes"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def _needs_transcode(data):
+    """Check whether an image has to be re-encoded before it is sent to Gemini"""
+    if not sniff_image_mime(data):
+        return True
+    
+    from PIL import Image
+    
+    # Only the header is parsed here - no pixels are decoded
+    try:
+        header = Image.open(io.BytesIO(data[:IMAGE_HEADER_BYTES]))
+    except Exception:
+        return True
+    return max(header.size) > MAX_IMAGE_DIMENSION or header.mode == 'CMYK'
+
+def prepare_image(file_content):
+    """Return (image bytes, mime type) for Gemini, re-encoding only when needed"""
+    # Telegram photos are already JPEG - forward small enough images without a decode/encode round-trip
+    if not _needs_transcode(file_content):
+        return file_content, sniff_image_mime(file_content)
+    
+    from PIL import Image
+    image = Image.open(io.BytesIO(file_content))
+    
+    # Paletted images (GIF, BMP) without transparency only need a new container - keep the
+    # palette and send PNG rather than expanding every pixel to RGB for JPEG
+    if image.mode == 'P' and 'transparency' not in image.info and max(image.size) <= MAX_IMAGE_DIMENSION:
+        img_byte_arr = io.BytesIO()
+        image.save(img_byte_arr, format='PNG')
+        return img_byte_arr.getvalue(), 'image/png'
+    
+    # Let libjpeg decode large JPEGs at a reduced DCT scale instead of decoding full size and shrinking
+    if image.format == 'JPEG':
+        scale = MAX_IMAGE_DIMENSION / max(image.size)
+        # Extreme aspect ratios would round a side to 0, which draft() can't handle
+        image.draft('RGB', (max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    
+    # Convert to RGB if necessary (for PNG with transparency)
+    if image.mode in ('RGBA', 'LA', 'P', 'CMYK'):
+        image = image.convert('RGB')
+    
+    # Receipts don't read any better above this size, it only costs upload time and tokens
+    image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+    
+    # Save as JPEG bytes
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='JPEG', quality=JPEG_QUALITY, optimize=False, progressive=False)
+    return img_byte_arr.getvalue(), 'image/jpeg'
+
+# Shared tracker, built once per process (worker start / Lambda cold start) and reused
+# by every request and warm invocation
+_TRACKER_LOCK = threading.Lock()
+try:
+    _TRACKER = ExpenseTracker()
+except Exception as e:
+    logger.error("Failed to initialize ExpenseTracker, retrying on first use: %s", e)
+    _TRACKER = None
+
+def get_tracker():
+    """Return the shared ExpenseTracker, creating it if startup initialization failed"""
+    global _TRACKER
+    if _TRACKER is None:
+        with _TRACKER_LOCK:
+            if _TRACKER is None:
+                _TRACKER = ExpenseTracker()
+    return _TRACKER
+
+# Workers for messages processed after the webhook has been acknowledged (outside Lambda)
+_POOL = ThreadPoolExecutor(max_workers=PROCESSING_WORKERS)
+
+# Update ids already dispatched, kept long enough to cover Telegram's webhook retries
+_SEEN_UPDATES = TTLCache(maxsize=4096, ttl=UPDATE_DEDUP_TTL)
+_SEEN_UPDATES_LOCK = threading.Lock()
+
 def send_telegram_message(chat_id, text):
     """Send message back to Telegram user"""
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
@@ -136,33 +447,262 @@ def send_telegram_message(chat_id, text):
         "parse_mode": "HTML"
     }
     try:
-        response = requests.post(url, json=data)
-        return response.json()
+        response = _TG_SESSION.post(url, data=orjson.dumps(data), headers=JSON_HEADERS, timeout=TELEGRAM_API_TIMEOUT)
+        return orjson.loads(response.content)
     except Exception as e:
-        logger.error(f"Error sending Telegram message: {e}")
+        logger.error("Error sending Telegram message: %s", e)
         return None
 
+def send_chat_action(chat_id, action='typing'):
+    """Show a chat action (e.g. "typing...") while a message is being processed"""
+    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendChatAction"
+    data = {
+        "chat_id": chat_id,
+        "action": action
+    }
+    try:
+        _TG_SESSION.post(url, data=orjson.dumps(data), headers=JSON_HEADERS, timeout=TELEGRAM_API_TIMEOUT).close()
+    except Exception as e:
+        logger.error("Error sending Telegram chat action: %s", e)
+
+def _read_file_body(response, limit):
+    """Read a streamed response body as bytes, or return None past limit bytes or on a short read"""
+    content_length = response.headers.get('Content-Length')
+    if content_length and not response.headers.get('Content-Encoding'):
+        if int(content_length) > limit:
+            return None
+        
+        # One sized read straight into the bytes object handed on to Gemini - no chunk joins
+        # and no bytearray to copy out of
+        body = response.raw.read(int(content_length))
+        
+        # The connection dropped early - a truncated image must not reach Gemini
+        if len(body) < int(content_length):
+            return None
+        return body
+    
+    # Unknown length - stream in chunks and stop as soon as the limit is passed
+    chunks = []
+    received = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        received += len(chunk)
+        if received > limit:
+            return None
+    return b''.join(chunks)
+
+class FileTooLargeError(Exception):
+    """Telegram reported a file larger than MAX_FILE_SIZE"""
+
 def download_telegram_file(file_id):
-    """Download file from Telegram"""
+    """Download file from Telegram, raising FileTooLargeError if getFile reports it over the limit"""
     try:
         # Get file path
         url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getFile"
-        response = requests.get(url, params={"file_id": file_id})
-        file_info = response.json()
+        response = _TG_SESSION.get(url, params={"file_id": file_id}, timeout=TELEGRAM_API_TIMEOUT)
+        file_info = orjson.loads(response.content)
         
         if not file_info.get('ok'):
             return None
             
         file_path = file_info['result']['file_path']
+        if file_info['result'].get('file_size', 0) > MAX_FILE_SIZE:
+            logger.warning("Telegram file too large: %s bytes", file_info['result']['file_size'])
+            raise FileTooLargeError(file_path)
         
         # Download file
         file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
-        file_response = requests.get(file_url)
+        with _TG_SESSION.get(file_url, stream=True, timeout=TELEGRAM_FILE_TIMEOUT) as file_response:
+            file_response.raise_for_status()
+            file_content = _read_file_body(file_response, MAX_FILE_SIZE)
+            if file_content is None:
+                logger.warning("Telegram file exceeded the download limit or arrived incomplete")
+            return file_content
+    except FileTooLargeError:
+        raise
+    except Exception as e:
+        logger.error("Error downloading Telegram file: %s", e)
+        return None
+
+def _start_analysis(chat_id, *warm_ups):
+    """Show "typing..." and run setup steps on the pool while a message is analysed"""
+    _POOL.submit(send_chat_action, chat_id)
+    for warm_up in warm_ups:
+        _POOL.submit(warm_up)
+
+def build_reply(message, tracker, chat_id):
+    """Handle a Telegram message and return the reply text, if any"""
+    expense_data = None
+    
+    # Handle different message types
+    if 'photo' in message:
+        # Handle photo
+        photo = pick_photo_size(message['photo'])
+        if photo.get('file_size', 0) > MAX_FILE_SIZE:
+            return FILE_TOO_LARGE_MSG
+        
+        # Show "typing..." and set up Gemini and Sheets while the photo downloads
+        _start_analysis(chat_id, tracker.warm_up, tracker.warm_up_sheets)
+        try:
+            file_content = download_telegram_file(photo['file_id'])
+        except FileTooLargeError:
+            return FILE_TOO_LARGE_MSG
+        
+        if file_content:
+            try:
+                if _fits_gemini(photo):
+                    # Telegram serves photos as JPEG - this size can go to Gemini untouched
+                    image_data, mime_type = file_content, 'image/jpeg'
+                else:
+                    image_data, mime_type = prepare_image(file_content)
+                expense_data = tracker.extract_expense_data(image_data=image_data, mime_type=mime_type)
+            except Exception as e:
+                logger.error("Error processing image: %s", e)
+                return "❌ Failed to process image"
+        else:
+            return "❌ Failed to download image"
+            
+    elif 'document' in message:
+        # Handle document
+        document = message['document']
+        if document['mime_type'].startswith('image/'):
+            # Reject oversized files before spending any bandwidth on them
+            if document.get('file_size', 0) > MAX_FILE_SIZE:
+                return FILE_TOO_LARGE_MSG
+            
+            _start_analysis(chat_id, tracker.warm_up, tracker.warm_up_sheets)
+            try:
+                file_content = download_telegram_file(document['file_id'])
+            except FileTooLargeError:
+                return FILE_TOO_LARGE_MSG
+            if file_content:
+                try:
+                    image_data, mime_type = prepare_image(file_content)
+                    expense_data = tracker.extract_expense_data(image_data=image_data, mime_type=mime_type)
+                except Exception as e:
+                    logger.error("Error processing document image: %s", e)
+                    return "❌ Failed to process document"
+            else:
+                return "❌ Failed to download document"
+        else:
+            return "📄 Please send an image file"
+            
+    elif 'text' in message:
+        # Handle text message
+        text_content = message['text']
         
-        return file_response.content
+        # Handle bot commands
+        if text_content.startswith('/'):
+            if text_content == '/start':
+                return """
+🤖 <b>Finance Tracker Bot</b>
+
+Send me:
+📷 Receipt photos
+💸 Text expenses (e.g., "Lunch $15")
+📄 Bill screenshots
+
+<b>Commands:</b>
+/summary - Current month summary
+/setup - Setup Google Sheets
+                """
+            
+            elif text_content == '/summary':
+                summary = tracker.get_monthly_summary()
+                if summary:
+                    return SUMMARY_TMPL.format_map({**_SUMMARY_DEFAULTS, **summary})
+                return "❌ Failed to get summary"
+            
+            elif text_content == '/setup':
+                if not tracker.sheets_manager:
+                    return "❌ Google Sheets not configured"
+                if tracker.sheets_manager.setup_sheets():
+                    return "✅ Google Sheets setup completed!"
+                return "❌ Failed to setup Google Sheets"
+            
+            return None
+        
+        # Text without a single digit can't be an expense - don't spend a Gemini call on it
+        if not _DIGIT_RE.search(text_content):
+            return "💸 Send a receipt or an amount like \"Coffee $5\""
+        
+        # Only ask Gemini when the text isn't a plain "<keyword> $<amount>" entry
+        expense_data = fast_parse_text(text_content)
+        if not expense_data:
+            _start_analysis(chat_id, tracker.warm_up_sheets)
+            expense_data = tracker.extract_expense_data(text_content=text_content)
+    
+    # Process expense data
+    if not expense_data:
+        return "❌ Could not process your message"
+    
+    if 'error' in expense_data:
+        return f"❌ {expense_data['error']}"
+    
+    # Log to sheets
+    if not tracker.log_to_sheets(expense_data):
+        return "❌ Failed to log expense"
+    
+    return LOGGED_TMPL.format_map({
+        **_LOGGED_DEFAULTS,
+        **expense_data,
+        'category': str(expense_data.get('category', 'N/A')).title()
+    })
+
+def process_message(message, chat_id):
+    """Process a Telegram message and send one reply for it"""
+    try:
+        tracker = get_tracker()
+        reply_text = build_reply(message, tracker, chat_id)
     except Exception as e:
-        logger.error(f"Error downloading Telegram file: {e}")
+        logger.error("Error processing message: %s", e)
+        return
+    
+    if reply_text:
+        send_telegram_message(chat_id, reply_text)
+
+def parse_update(data):
+    """Return (message, chat_id) for a Telegram message update, or None if there is nothing to do"""
+    if not data or 'message' not in data:
+        logger.info("Not a message event or invalid data")
+        return None
+        
+    message = data.get('message', {})
+    chat_id = message.get('chat', {}).get('id')
+    
+    if not chat_id:
+        logger.warning("No chat_id found in message")
         return None
+    
+    return message, chat_id
+
+def is_duplicate_update(update_id):
+    """Record an update id, returning True if it was already seen recently"""
+    if update_id is None:
+        return False
+    
+    with _SEEN_UPDATES_LOCK:
+        if update_id in _SEEN_UPDATES:
+            return True
+        _SEEN_UPDATES[update_id] = True
+    return False
+
+def forget_update(update_id):
+    """Drop a recorded update id so Telegram's retry of it is processed"""
+    with _SEEN_UPDATES_LOCK:
+        _SEEN_UPDATES.pop(update_id, None)
+
+def dispatch_message(message, chat_id):
+    """Run process_message in the background"""
+    if os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        # Imported here - zappa.asynchronous creates boto3 clients at import time
+        from zappa.asynchronous import task
+        
+        # Zappa re-invokes the function asynchronously (InvocationType='Event'), and the
+        # invoked container looks up app.process_message and runs it directly
+        task(process_message)(message, chat_id)
+    else:
+        _POOL.submit(process_message, message, chat_id)
 
 # Flask Routes
 @app.route('/', methods=['GET'])
@@ -183,162 +723,35 @@ def telegram_webhook():
         # Get request data
         data = request.get_json()
         
-        if not data or 'message' not in data:
-            logger.info("Not a message event or invalid data")
+        # Only pay for building log records someone will read
+        if DEBUG_DUMP_EVENT:
+            logger.info("Received update: %s", request.get_data(as_text=True))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Update keys=%s body_len=%s", list(data or ()), request.content_length)
+        
+        update = parse_update(data)
+        if not update:
             return jsonify({"status": "OK"}), 200
-            
-        message = data.get('message', {})
-        chat_id = message.get('chat', {}).get('id')
         
-        if not chat_id:
-            logger.warning("No chat_id found in message")
+        # Telegram re-delivers updates it thinks failed - process each one only once
+        if is_duplicate_update(data.get('update_id')):
+            logger.info("Skipping duplicate update %s", data.get('update_id'))
             return jsonify({"status": "OK"}), 200
         
-        # Initialize tracker
-        tracker = ExpenseTracker()
-        expense_data = None
+        message, chat_id = update
         
-        # Handle different message types
-        if 'photo' in message:
-            # Handle photo
-            photo = message['photo'][-1]  # Get highest resolution
-            file_content = download_telegram_file(photo['file_id'])
-            
-            if file_content:
-                # Convert to JPEG format if needed
-                try:
-                    image = Image.open(io.BytesIO(file_content))
-                    # Convert to RGB if necessary (for PNG with transparency)
-                    if image.mode in ('RGBA', 'LA', 'P'):
-                        image = image.convert('RGB')
-                    
-                    # Save as JPEG bytes
-                    img_byte_arr = io.BytesIO()
-                    image.save(img_byte_arr, format='JPEG', quality=85)
-                    img_byte_arr = img_byte_arr.getvalue()
-                    
-                    expense_data = tracker.extract_expense_data(image_data=img_byte_arr)
-                except Exception as e:
-                    logger.error(f"Error processing image: {e}")
-                    send_telegram_message(chat_id, "❌ Failed to process image")
-                    return jsonify({"status": "OK"}), 200
-            else:
-                send_telegram_message(chat_id, "❌ Failed to download image")
-                return jsonify({"status": "OK"}), 200
-                
-        elif 'document' in message:
-            # Handle document
-            document = message['document']
-            if document['mime_type'].startswith('image/'):
-                file_content = download_telegram_file(document['file_id'])
-                if file_content:
-                    try:
-                        image = Image.open(io.BytesIO(file_content))
-                        # Convert to RGB if necessary
-                        if image.mode in ('RGBA', 'LA', 'P'):
-                            image = image.convert('RGB')
-                        
-                        # Save as JPEG bytes
-                        img_byte_arr = io.BytesIO()
-                        image.save(img_byte_arr, format='JPEG', quality=85)
-                        img_byte_arr = img_byte_arr.getvalue()
-                        
-                        expense_data = tracker.extract_expense_data(image_data=img_byte_arr)
-                    except Exception as e:
-                        logger.error(f"Error processing document image: {e}")
-                        send_telegram_message(chat_id, "❌ Failed to process document")
-                        return jsonify({"status": "OK"}), 200
-                else:
-                    send_telegram_message(chat_id, "❌ Failed to download document")
-                    return jsonify({"status": "OK"}), 200
-            else:
-                send_telegram_message(chat_id, "📄 Please send an image file")
-                return jsonify({"status": "OK"}), 200
-                
-        elif 'text' in message:
-            # Handle text message
-            text_content = message['text']
-            
-            # Handle bot commands
-            if text_content.startswith('/'):
-                if text_content == '/start':
-                    welcome_msg = """
-🤖 <b>Finance Tracker Bot</b>
-
-Send me:
-📷 Receipt photos
-💸 Text expenses (e.g., "Lunch $15")
-📄 Bill screenshots
-
-<b>Commands:</b>
-/summary - Current month summary
-/setup - Setup Google Sheets
-                    """
-                    send_telegram_message(chat_id, welcome_msg)
-                
-                elif text_content == '/summary':
-                    summary = tracker.get_monthly_summary()
-                    if summary:
-                        summary_msg = f"""
-📊 <b>Monthly Summary ({summary['month']})</b>
-
-💰 <b>Total:</b> ${summary['total']:.2f}
-
-<b>By Category:</b>
-🍔 Food: ${summary['food']:.2f}
-🚗 Transport: ${summary['transport']:.2f}
-⚡ Utilities: ${summary['utilities']:.2f}
-🛍️ Shopping: ${summary['shopping']:.2f}
-🎬 Entertainment: ${summary['entertainment']:.2f}
-🏥 Healthcare: ${summary['healthcare']:.2f}
-📋 Other: ${summary['other']:.2f}
-                        """
-                        send_telegram_message(chat_id, summary_msg)
-                    else:
-                        send_telegram_message(chat_id, "❌ Failed to get summary")
-                
-                elif text_content == '/setup':
-                    if tracker.sheets_manager:
-                        success = tracker.sheets_manager.setup_sheets()
-                        if success:
-                            send_telegram_message(chat_id, "✅ Google Sheets setup completed!")
-                        else:
-                            send_telegram_message(chat_id, "❌ Failed to setup Google Sheets")
-                    else:
-                        send_telegram_message(chat_id, "❌ Google Sheets not configured")
-                
-                return jsonify({"status": "OK"}), 200
-            
-            expense_data = tracker.extract_expense_data(text_content=text_content)
-        
-        # Process expense data
-        if expense_data:
-            if 'error' in expense_data:
-                send_telegram_message(chat_id, f"❌ {expense_data['error']}")
-            else:
-                # Log to sheets
-                success = tracker.log_to_sheets(expense_data)
-                
-                if success:
-                    response_msg = f"""
-✅ <b>Expense Logged!</b>
-
-💰 Amount: ${expense_data.get('amount', 'N/A')}
-📂 Category: {expense_data.get('category', 'N/A').title()}
-📝 Description: {expense_data.get('description', 'N/A')}
-📅 Date: {expense_data.get('date', 'N/A')}
-🏪 Merchant: {expense_data.get('merchant', 'N/A')}
-                    """
-                    send_telegram_message(chat_id, response_msg)
-                else:
-                    send_telegram_message(chat_id, "❌ Failed to log expense")
-        else:
-            send_telegram_message(chat_id, "❌ Could not process your message")
+        # Reply from a background worker so Telegram gets its 200 right away
+        try:
+            dispatch_message(message, chat_id)
+        except Exception:
+            # Nothing will process this update - let Telegram's redelivery through
+            forget_update(data.get('update_id'))
+            raise
         
         return jsonify({"status": "OK"}), 200
         
     except Exception as e:
-        logger.error(f"Error in webhook handler: {e}")
+        logger.error("Error in webhook handler: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/set_webhook', methods=['POST'])
@@ -355,8 +768,13 @@ def set_webhook():
     
     try:
         url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/setWebhook"
-        response = requests.post(url, json={"url": webhook_url})
-        result = response.json()
+        response = _TG_SESSION.post(
+            url,
+            data=orjson.dumps({"url": webhook_url}),
+            headers=JSON_HEADERS,
+            timeout=TELEGRAM_API_TIMEOUT
+        )
+        result = orjson.loads(response.content)
         
         if result.get('ok'):
             return jsonify({"status": "success", "message": "Webhook set successfully"}), 200
@@ -375,12 +793,12 @@ if __name__ == "__main__":
         missing_vars.append("GEMINI_API_KEY")
     
     if missing_vars:
-        logger.warning(f"Missing environment variables: {', '.join(missing_vars)}")
+        logger.warning("Missing environment variables: %s", ', '.join(missing_vars))
         logger.warning("Some features may be disabled")
     
     # Run Flask app
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
-    logger.info(f"Starting Flask app on port {port}")
+    logger.info("Starting Flask app on port %s", port)
     app.run(host='0.0.0.0', port=port, debug=debug) 
\ No newline at end of file
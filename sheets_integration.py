@@ -1,39 +1,204 @@
+import functools
 import json
 import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Monthly_Totals columns B:I, in sheet order
+MONTHLY_TOTAL_COLUMNS = ('total', 'food', 'transport', 'utilities', 'shopping', 'entertainment', 'healthcare', 'other')
+EXPENSE_CATEGORIES = MONTHLY_TOTAL_COLUMNS[1:]
+
+# Expenses columns A:E as (expense key, default), in sheet order - Month follows in F
+_LOG_FIELDS = (('date', ''), ('amount', 0), ('category', 'other'), ('description', ''), ('merchant', ''))
+
+# Sheets every spreadsheet needs, created by /setup
+REQUIRED_SHEETS = ('Expenses', 'Monthly_Totals')
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_MONTH_RE = re.compile(r'^\d{4}-\d{2}$')
+# An amount Gemini returned as text, optionally with a currency code or symbol on either side
+_AMOUNT_TEXT_RE = re.compile(r'^(?:[A-Za-z]{1,3}\s*)?[$€£¥₹]?\s*(-?[\d.,]+)\s*[$€£¥₹]?\s*(?:[A-Za-z]{3})?$')
+# Plain decimals, or commas that are real thousands groups - "5,50" or "1.200,00" are rejected
+_AMOUNT_NUMBER_RE = re.compile(r'^-?(?:\d+|\d{1,3}(?:,\d{3})+)(?:\.\d+)?$')
+
+# Transient Sheets errors (rate limit, server side) are retried with backoff. A write that
+# failed server-side may still have been applied, and appends aren't idempotent, so writes
+# are only retried when rate limited
+SHEETS_RETRY_STATUSES = (429, 500, 502, 503, 504)
+SHEETS_WRITE_RETRY_STATUSES = (429,)
+SHEETS_MAX_ATTEMPTS = 5
+
+# Sheets allows 60 writes per minute per user - keep writes at most one a second
+SHEETS_WRITE_INTERVAL = 1.0
+
+def _to_number(value):
+    """Read a sheet cell as a number, treating blanks as 0 - text raises rather than reading as 0"""
+    if value is None or value == '':
+        return 0
+    return float(value)
+
+def _parse_amount(value):
+    """Read an expense amount, accepting strings like "$5.50" or "1,200.00 USD" - anything else raises"""
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, str):
+        # A wrong amount in the ledger is worse than a rejected one, so ambiguous text raises
+        match = _AMOUNT_TEXT_RE.match(value.strip())
+        if not match or not _AMOUNT_NUMBER_RE.match(match.group(1)):
+            raise ValueError(f"not an amount: {value!r}")
+        return float(match.group(1).replace(',', ''))
+    return float(value)
+
+MonthlyRow = namedtuple('MonthlyRow', ('month',) + MONTHLY_TOTAL_COLUMNS)
+
+def _row_to_monthly(row):
+    """Convert a Monthly_Totals row, which the API returns without trailing blanks, to a MonthlyRow"""
+    padded = (list(row) + [''] * len(MonthlyRow._fields))[:len(MonthlyRow._fields)]
+    return MonthlyRow(padded[0], *map(_to_number, padded[1:]))
+
+def _month_sum(month_str, category=None):
+    """Sheets formula summing a month's Expenses amounts, optionally for a single category"""
+    # TEXT() also matches Month cells that Sheets stored as dates; = compares case-insensitively
+    criteria = f'--(TEXT(Expenses!F2:F,"yyyy-mm")="{month_str}")'
+    if category:
+        criteria += f',--(Expenses!C2:C="{category}")'
+    return f'SUMPRODUCT(Expenses!B2:B,{criteria})'
+
+def _monthly_formula_row(month_str):
+    """Monthly_Totals RowData for a month, with totals Sheets computes from the Expenses sheet"""
+    named = EXPENSE_CATEGORIES[:-1]
+    formulas = {column: _month_sum(month_str, column) for column in named}
+    formulas['total'] = _month_sum(month_str)
+    # Unknown and blank categories count as other: the row's total (B) less its named categories (C:H),
+    # read from the row itself rather than summing the Expenses sheet again
+    formulas['other'] = 'INDEX(B:B,ROW())-SUM(INDEX(C:H,ROW(),0))'
+    
+    cells = [{'userEnteredValue': {'stringValue': month_str}}]
+    cells.extend({'userEnteredValue': {'formulaValue': '=' + formulas[column]}} for column in MONTHLY_TOTAL_COLUMNS)
+    return {'values': cells}
+
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+@functools.lru_cache(maxsize=None)
+def _get_credentials(credentials_json=None):
+    """Parse the service-account credentials once per process"""
+    # Imported here to keep the Google client libraries off the cold start path
+    from google.oauth2.service_account import Credentials
+    
+    if credentials_json:
+        return Credentials.from_service_account_info(json.loads(credentials_json), scopes=SHEETS_SCOPES)
+    
+    # For local development - use service account file
+    return Credentials.from_service_account_file('service_account.json', scopes=SHEETS_SCOPES)
+
+# httplib2 connections are not thread-safe - every thread gets its own authorized one
+_THREAD_HTTP = threading.local()
+
+def _thread_http(credentials):
+    """Return this thread's authorized HTTP connection for the given credentials"""
+    import google_auth_httplib2
+    from googleapiclient.http import build_http
+    
+    connections = getattr(_THREAD_HTTP, 'connections', None)
+    if connections is None:
+        connections = _THREAD_HTTP.connections = {}
+    if id(credentials) not in connections:
+        connections[id(credentials)] = google_auth_httplib2.AuthorizedHttp(credentials, http=build_http())
+    return connections[id(credentials)]
+
+@functools.lru_cache(maxsize=None)
+def _get_service(credentials_json=None):
+    """Build the Sheets API client once per process, sending each request on the calling thread's connection"""
+    from googleapiclient.discovery import build
+    from googleapiclient.http import HttpRequest
+    
+    credentials = _get_credentials(credentials_json)
+    
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(_thread_http(credentials), *args, **kwargs)
+    
+    # Use the discovery document bundled with the client - no fetch and no file cache lookup
+    return build(
+        'sheets', 'v4',
+        http=_thread_http(credentials),
+        requestBuilder=build_request,
+        cache_discovery=False,
+        static_discovery=True
+    )
+
 class SheetsManager:
     def __init__(self, credentials_json=None, spreadsheet_id=None):
         """Initialize Google Sheets connection"""
         self.spreadsheet_id = spreadsheet_id or os.environ.get('GOOGLE_SHEETS_ID')
         
-        # Setup credentials
-        if credentials_json:
-            creds_dict = json.loads(credentials_json)
-            self.credentials = Credentials.from_service_account_info(
-                creds_dict, 
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-        else:
-            # For local development - use service account file
-            self.credentials = Credentials.from_service_account_file(
-                'service_account.json',
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-        
-        self.service = build('sheets', 'v4', credentials=self.credentials)
+        # Credentials and the API client are shared by every manager in the process; requests
+        # still go out on a connection owned by the calling thread
+        self.credentials = _get_credentials(credentials_json)
+        self.service = _get_service(credentials_json)
         self.sheet = self.service.spreadsheets()
+        
+        # Expenses waiting to be written by the next batch
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        
+        # Sheet ids by title, needed for batchUpdate requests
+        self._sheet_ids = None
+        
+        # Whether Monthly_Totals has been checked for rows without the current formulas
+        self._totals_reconciled = False
+        
+        # Monthly_Totals row number by month, and the last used row. The dict is never changed
+        # in place - a new one is swapped in under the lock, so readers always see a whole index
+        self._month_row_cache = {}
+        self._month_rows_end = 0
+        self._index_lock = threading.Lock()
+        
+        # Earliest time the next write may go out
+        self._write_lock = threading.Lock()
+        self._next_write_at = 0.0
+    
+    def _execute(self, request, write=False):
+        """Execute a Sheets API request, pacing writes and retrying transient errors"""
+        from googleapiclient.errors import HttpError
+        
+        retry_statuses = SHEETS_WRITE_RETRY_STATUSES if write else SHEETS_RETRY_STATUSES
+        for attempt in range(SHEETS_MAX_ATTEMPTS):
+            if write:
+                self._wait_for_write_slot()
+            try:
+                return request.execute()
+            except HttpError as e:
+                if e.resp.status not in retry_statuses or attempt == SHEETS_MAX_ATTEMPTS - 1:
+                    raise
+                delay = (2 ** attempt) * random.random() + 0.1
+                logger.warning("Sheets API returned %s, retrying in %.1fs", e.resp.status, delay)
+                time.sleep(delay)
+    
+    def _wait_for_write_slot(self):
+        """Block until the write rate limit allows another write"""
+        with self._write_lock:
+            now = time.monotonic()
+            wait = self._next_write_at - now
+            self._next_write_at = max(now, self._next_write_at) + SHEETS_WRITE_INTERVAL
+        if wait > 0:
+            time.sleep(wait)
     
     def setup_sheets(self):
         """Create the required sheets if they don't exist"""
+        self._sheet_ids = None
+        with self._index_lock:
+            self._month_row_cache = {}
         try:
             # Get existing sheets
-            result = self.sheet.get(spreadsheetId=self.spreadsheet_id).execute()
+            result = self._execute(self.sheet.get(spreadsheetId=self.spreadsheet_id))
             existing_sheets = [s['properties']['title'] for s in result['sheets']]
             
             requests = []
@@ -59,16 +224,19 @@ class SheetsManager:
                 })
             
             if requests:
-                self.sheet.batchUpdate(
+                self._execute(self.sheet.batchUpdate(
                     spreadsheetId=self.spreadsheet_id,
                     body={'requests': requests}
-                ).execute()
+                ), write=True)
             
             # Setup headers
             self._setup_headers()
             
+            self._reconcile_monthly_totals()
+            self._totals_reconciled = True
+            
         except Exception as e:
-            logger.error(f"Error setting up sheets: {e}")
+            logger.error("Error setting up sheets: %s", e)
             return False
         
         return True
@@ -78,168 +246,298 @@ class SheetsManager:
         try:
             # Expenses sheet headers
             expense_headers = [['Date', 'Amount', 'Category', 'Description', 'Merchant', 'Month']]
-            self.sheet.values().update(
+            self._execute(self.sheet.values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range='Expenses!A1:F1',
                 valueInputOption='RAW',
                 body={'values': expense_headers}
-            ).execute()
+            ), write=True)
             
             # Monthly totals headers
             monthly_headers = [['Month', 'Total_Amount', 'Food', 'Transport', 'Utilities', 'Shopping', 'Entertainment', 'Healthcare', 'Other']]
-            self.sheet.values().update(
+            self._execute(self.sheet.values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range='Monthly_Totals!A1:I1',
                 valueInputOption='RAW',
                 body={'values': monthly_headers}
-            ).execute()
+            ), write=True)
             
         except Exception as e:
-            logger.error(f"Error setting up headers: {e}")
+            logger.error("Error setting up headers: %s", e)
+    
+    def _reconcile_monthly_totals(self):
+        """Rewrite Monthly_Totals rows that don't hold the current formulas and add rows for months that lack one"""
+        result = self._execute(self.sheet.values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=['Monthly_Totals!A:A', 'Expenses!F:F']
+        ))
+        month_column, expense_months = [
+            value_range.get('values', []) for value_range in result.get('valueRanges', [])
+        ]
+        # Formulas as entered, read separately since months may be stored as dates
+        formula_rows = self._execute(self.sheet.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range='Monthly_Totals!B:I',
+            valueRenderOption='FORMULA'
+        )).get('values', [])
+        sheet_id = self._get_sheet_ids()['Monthly_Totals']
+        
+        # Rows written by older versions hold plain numbers or older formulas - replace them in place
+        requests = []
+        known_months = set()
+        for i, row in enumerate(month_column[1:], 1):  # Skip header
+            if row and _MONTH_RE.match(row[0]):
+                known_months.add(row[0])
+                formula_row = _monthly_formula_row(row[0])
+                current = formula_rows[i] if i < len(formula_rows) else []
+                if current == [cell['userEnteredValue']['formulaValue'] for cell in formula_row['values'][1:]]:
+                    continue
+                requests.append({
+                    'updateCells': {
+                        'start': {'sheetId': sheet_id, 'rowIndex': i, 'columnIndex': 0},
+                        'rows': [formula_row],
+                        'fields': 'userEnteredValue'
+                    }
+                })
+        
+        missing_months = dict.fromkeys(
+            row[0] for row in expense_months[1:] if row and _MONTH_RE.match(row[0]) and row[0] not in known_months
+        )
+        if missing_months:
+            requests.append({
+                'appendCells': {
+                    'sheetId': sheet_id,
+                    'rows': [_monthly_formula_row(month_str) for month_str in missing_months],
+                    'fields': 'userEnteredValue'
+                }
+            })
+        
+        if requests:
+            self._execute(self.sheet.batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'requests': requests}
+            ), write=True)
+            # Appended rows move the end of Monthly_Totals - rebuild the index on the next lookup
+            with self._index_lock:
+                self._month_row_cache = {}
+    
+    def _ensure_totals_reconciled(self):
+        """Convert Monthly_Totals rows left by older versions before this process first logs"""
+        if self._totals_reconciled:
+            return
+        try:
+            self._reconcile_monthly_totals()
+            self._totals_reconciled = True
+        except Exception as e:
+            # Logging still works - stale rows only keep their old totals, so try again next time
+            logger.warning("Could not reconcile monthly totals: %s", e)
     
     def log_expense(self, expense_data):
         """Log a single expense to the Expenses sheet"""
         try:
-            date_str = expense_data.get('date', datetime.now().strftime('%Y-%m-%d'))
-            month_str = datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m')
-            
-            row_data = [
-                date_str,
-                expense_data.get('amount', 0),
-                expense_data.get('category', 'other'),
-                expense_data.get('description', ''),
-                expense_data.get('merchant', ''),
-                month_str
-            ]
-            
-            # Append to expenses sheet
-            self.sheet.values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range='Expenses!A:F',
-                valueInputOption='USER_ENTERED',
-                body={'values': [row_data]}
-            ).execute()
+            # Dates Gemini couldn't read fall back to today
+            date_str = expense_data.get('date')
+            if not date_str or not _DATE_RE.match(date_str):
+                date_str = datetime.now().strftime('%Y-%m-%d')
+            month_str = date_str[:7]
             
-            # Update monthly totals
-            self._update_monthly_totals(month_str)
+            row_data = [expense_data.get(key, default) for key, default in _LOG_FIELDS]
+            row_data[0] = date_str
+            # The totals formulas only sum numeric cells
+            row_data[1] = _parse_amount(row_data[1])
+            row_data.append(month_str)
             
+        except Exception as e:
+            logger.error("Error logging expense: %s", e)
+            return False
+        
+        pending = {'row': row_data, 'success': None}
+        with self._pending_lock:
+            self._pending.append(pending)
+        
+        # Whoever holds the flush lock writes every queued row, so expenses logged
+        # concurrently share one append; later callers find theirs already written
+        with self._flush_lock:
+            if pending['success'] is None:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                
+                self._ensure_totals_reconciled()
+                success = self._write_expenses([p['row'] for p in batch])
+                for p in batch:
+                    p['success'] = success
+        
+        return pending['success']
+    
+    def _write_expenses(self, rows):
+        """Append a batch of expense rows, and the monthly total rows of new months, in a single write"""
+        from googleapiclient.errors import HttpError
+        
+        try:
+            try:
+                self._send_expenses(rows)
+            except HttpError as e:
+                # /setup in another process may have recreated a sheet under a new id - look the
+                # ids up again once. A 400 means nothing was applied, so resending is safe
+                if e.resp.status != 400 or self._sheet_ids is None:
+                    raise
+                self._sheet_ids = None
+                self._send_expenses(rows)
             return True
             
         except Exception as e:
-            logger.error(f"Error logging expense: {e}")
+            logger.error("Error logging expenses: %s", e)
             return False
     
-    def _update_monthly_totals(self, month_str):
-        """Update or create monthly totals for the given month"""
-        try:
-            # Get current monthly totals
-            result = self.sheet.values().get(
+    def _send_expenses(self, rows):
+        """Build and send the batchUpdate for a batch of expense rows"""
+        sheet_ids = self._get_sheet_ids()
+        
+        # appendCells picks the next free row server-side, so concurrent writers never collide
+        requests = [{
+            'appendCells': {
+                'sheetId': sheet_ids['Expenses'],
+                'rows': [self._row_cells(row) for row in rows],
+                'fields': 'userEnteredValue'
+            }
+        }]
+        month_requests, new_months = self._monthly_total_requests(rows, sheet_ids.get('Monthly_Totals'))
+        requests.extend(month_requests)
+        
+        self._execute(self.sheet.batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={'requests': requests}
+        ), write=True)
+        
+        self._remember_new_months(new_months)
+    
+    def _get_sheet_ids(self):
+        """Map sheet titles to sheet ids, cached once every required sheet exists"""
+        sheet_ids = self._sheet_ids
+        if sheet_ids is None:
+            result = self._execute(self.sheet.get(
                 spreadsheetId=self.spreadsheet_id,
-                range='Monthly_Totals!A:I'
-            ).execute()
+                fields='sheets.properties(sheetId,title)'
+            ))
+            sheet_ids = {
+                s['properties']['title']: s['properties']['sheetId'] for s in result['sheets']
+            }
+            # Until /setup has run (possibly in another process) keep looking the sheets up
+            if all(title in sheet_ids for title in REQUIRED_SHEETS):
+                self._sheet_ids = sheet_ids
+        return sheet_ids
+    
+    @staticmethod
+    def _row_cells(row):
+        """Convert a row of values into a batchUpdate RowData"""
+        cells = []
+        for value in row:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                cells.append({'userEnteredValue': {'numberValue': value}})
+            elif value is None:
+                # Fields Gemini returned as null stay blank
+                cells.append({})
+            else:
+                cells.append({'userEnteredValue': {'stringValue': str(value)}})
+        return {'values': cells}
+    
+    def _monthly_total_requests(self, rows, sheet_id):
+        """Build the request that adds a Monthly_Totals row for months that don't have one yet,
+        returning (requests, new months)"""
+        if sheet_id is None:
+            logger.error("Monthly_Totals sheet not found - run /setup")
+            return [], []
+        
+        # Totals are formulas over Expenses, so existing months need no write and concurrent
+        # writers can't lose each other's updates. A failed lookup fails the whole batch rather
+        # than log expenses into a month without a totals row. Two processes adding the same
+        # new month at once both append it; the rows are identical and the first one is read.
+        months = dict.fromkeys(row[5] for row in rows)
+        row_numbers = self._get_month_row_numbers(months)
+        new_months = [month_str for month_str in months if month_str not in row_numbers]
+        if not new_months:
+            return [], []
+        
+        return [{
+            'appendCells': {
+                'sheetId': sheet_id,
+                'rows': [_monthly_formula_row(month_str) for month_str in new_months],
+                'fields': 'userEnteredValue'
+            }
+        }], new_months
+    
+    def _remember_new_months(self, new_months):
+        """Add rows just appended to Monthly_Totals to the index, where they should have landed"""
+        if not new_months:
+            return
+        with self._index_lock:
+            index = dict(self._month_row_cache)
+            for month_str in new_months:
+                self._month_rows_end += 1
+                index[month_str] = self._month_rows_end
+            self._month_row_cache = index
+    
+    def _get_month_row_numbers(self, months, refresh=False):
+        """Return the Monthly_Totals row number of each month that has one, from the cached index"""
+        with self._index_lock:
+            index = self._month_row_cache
+        
+        if refresh or any(month not in index for month in months):
+            # Only column A is needed to locate rows
+            result = self._execute(self.sheet.values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range='Monthly_Totals!A:A'
+            ))
             
             values = result.get('values', [])
-            
-            # Find if month exists
-            month_row = None
+            index = {}
             for i, row in enumerate(values[1:], 2):  # Skip header
-                if row and row[0] == month_str:
-                    month_row = i
-                    break
+                if row:
+                    index.setdefault(row[0], i)
             
-            # Calculate totals for this month
-            expense_result = self.sheet.values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range='Expenses!A:F'
-            ).execute()
-            
-            expense_values = expense_result.get('values', [])
-            
-            # Calculate category totals
-            totals = {
-                'total': 0,
-                'food': 0,
-                'transport': 0,
-                'utilities': 0,
-                'shopping': 0,
-                'entertainment': 0,
-                'healthcare': 0,
-                'other': 0
-            }
-            
-            for row in expense_values[1:]:  # Skip header
-                if len(row) >= 6 and row[5] == month_str:  # Month column
-                    amount = float(row[1]) if row[1] else 0
-                    category = row[2].lower() if row[2] else 'other'
-                    
-                    totals['total'] += amount
-                    if category in totals:
-                        totals[category] += amount
-                    else:
-                        totals['other'] += amount
-            
-            # Update or insert row
-            new_row = [
-                month_str,
-                totals['total'],
-                totals['food'],
-                totals['transport'],
-                totals['utilities'],
-                totals['shopping'],
-                totals['entertainment'],
-                totals['healthcare'],
-                totals['other']
-            ]
-            
-            if month_row:
-                # Update existing row
-                self.sheet.values().update(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=f'Monthly_Totals!A{month_row}:I{month_row}',
-                    valueInputOption='USER_ENTERED',
-                    body={'values': [new_row]}
-                ).execute()
-            else:
-                # Append new row
-                self.sheet.values().append(
-                    spreadsheetId=self.spreadsheet_id,
-                    range='Monthly_Totals!A:I',
-                    valueInputOption='USER_ENTERED',
-                    body={'values': [new_row]}
-                ).execute()
-                
-        except Exception as e:
-            logger.error(f"Error updating monthly totals: {e}")
+            with self._index_lock:
+                self._month_row_cache = index
+                self._month_rows_end = len(values)
+        
+        return {month: index[month] for month in months if month in index}
+    
+    def _read_month_rows(self, months, refresh=False):
+        """Fetch {month: (row number, row values)} for months already in Monthly_Totals"""
+        row_numbers = self._get_month_row_numbers(months, refresh)
+        if not row_numbers:
+            return {}
+        
+        # Unformatted so currency or locale formatting on the sheet can't change the numbers read
+        result = self._execute(self.sheet.values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=[f'Monthly_Totals!A{i}:I{i}' for i in row_numbers.values()],
+            valueRenderOption='UNFORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING'
+        ))
+        
+        month_rows = {}
+        for (month, i), value_range in zip(row_numbers.items(), result.get('valueRanges', [])):
+            row = (value_range.get('values') or [[]])[0]
+            if row[:1] != [month]:
+                # Rows moved underneath the cache (edited or written elsewhere) - rebuild it once
+                return {} if refresh else self._read_month_rows(months, refresh=True)
+            month_rows[month] = (i, row)
+        
+        return month_rows
     
     def get_monthly_total(self, month_str=None):
-        """Get total for current or specified month"""
+        """Get total for current or specified month, or None if Sheets couldn't be read"""
         if not month_str:
             month_str = datetime.now().strftime('%Y-%m')
         
         try:
-            result = self.sheet.values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range='Monthly_Totals!A:I'
-            ).execute()
-            
-            values = result.get('values', [])
-            
-            for row in values[1:]:  # Skip header
-                if row and row[0] == month_str:
-                    return {
-                        'month': row[0],
-                        'total': float(row[1]) if len(row) > 1 and row[1] else 0,
-                        'food': float(row[2]) if len(row) > 2 and row[2] else 0,
-                        'transport': float(row[3]) if len(row) > 3 and row[3] else 0,
-                        'utilities': float(row[4]) if len(row) > 4 and row[4] else 0,
-                        'shopping': float(row[5]) if len(row) > 5 and row[5] else 0,
-                        'entertainment': float(row[6]) if len(row) > 6 and row[6] else 0,
-                        'healthcare': float(row[7]) if len(row) > 7 and row[7] else 0,
-                        'other': float(row[8]) if len(row) > 8 and row[8] else 0
-                    }
+            # Read just the month's row, located through the cached index
+            month_rows = self._read_month_rows([month_str])
             
-            return {'month': month_str, 'total': 0}
+            # A month with nothing logged yet reads as all zeroes
+            row = month_rows.get(month_str, (None, [month_str]))[1]
+            return _row_to_monthly(row)._asdict()
             
         except Exception as e:
-            logger.error(f"Error getting monthly total: {e}")
-            return {'month': month_str, 'total': 0} 
\ No newline at end of file
+            logger.error("Error getting monthly total: %s", e)
+            return None 
\ No newline at end of file